@@ -1,14 +1,29 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import Coder
+from fastapi_cache.decorator import cache
 import httpx
 import asyncio
-from typing import List, Dict, Any, Optional
+from aiolimiter import AsyncLimiter
+from tenacity import RetryCallState, retry, retry_if_exception, stop_after_attempt, stop_after_delay, wait_exponential
+from typing import List, Dict, Any, Optional, Tuple
+from cachetools import TLRUCache
+import hashlib
+import inspect
 import json
+import orjson
+import redis.asyncio as redis
 import re
 from urllib.parse import quote
 import logging
 import os
+import time
+import zlib
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,13 +32,20 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Local Lore API",
     description="Discover India's Hidden Heritage through Wikimedia APIs",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# Enable CORS for PWA
+# Enable CORS for PWA; comma-separated list of allowed origins
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "https://local-lore.app").split(",") if origin.strip()]
+if "CORS_ORIGINS" not in os.environ:
+    logger.warning(f"CORS_ORIGINS not set, only allowing the default origin {CORS_ORIGINS}")
+else:
+    logger.info(f"CORS allowed origins: {CORS_ORIGINS}")
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -34,6 +56,14 @@ WIKIPEDIA_API = "https://en.wikipedia.org/w/api.php"
 COMMONS_API = "https://commons.wikimedia.org/w/api.php"
 WIKIVOYAGE_API = "https://en.wikivoyage.org/w/api.php"
 
+# Response cache TTLs in seconds
+SEARCH_CACHE_TTL = 60 * 60
+ARTICLE_CACHE_TTL = 24 * 60 * 60
+LANGUAGES_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Entry limit for the in-process cache used when Redis isn't configured
+MEMORY_CACHE_MAXSIZE = 1024
+
 # Language mapping for multilingual support
 LANGUAGE_CODES = {
     "en": "en",
@@ -43,15 +73,106 @@ LANGUAGE_CODES = {
     "bn": "bn"
 }
 
+# Most articles TextExtracts will return extracts for in one query
+MAX_ARTICLE_BATCH = 20
+
+# Per-language API endpoints, built once at startup
+WIKIPEDIA_API_URLS = {code: f"https://{wiki_lang}.wikipedia.org/w/api.php" for code, wiki_lang in LANGUAGE_CODES.items()}
+WIKIVOYAGE_API_URLS = {code: f"https://{wiki_lang}.wikivoyage.org/w/api.php" for code, wiki_lang in LANGUAGE_CODES.items()}
+
+# Shared HTTP client so TCP/TLS connections are pooled across requests
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=300
+)
+
+# Wikimedia asks clients for a descriptive User-Agent; extracts compress well
+HTTP_HEADERS = {
+    "User-Agent": "LocalLore/1.0 (https://github.com/1tonystarc/Local-Lore)",
+    "Accept-Encoding": "br, gzip"
+}
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=30.0, limits=HTTP_LIMITS, headers=HTTP_HEADERS, http2=True)
+    return _http_client
+
+# Throttle Wikimedia traffic: overall request rate plus concurrent requests per host
+WIKI_LIMITER = AsyncLimiter(max_rate=200, time_period=1)
+MAX_CONCURRENT_PER_HOST = 64
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+def get_host_semaphore(url: str) -> asyncio.Semaphore:
+    """Return the concurrency limiter for the host of the given URL"""
+    host = httpx.URL(url).host
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(MAX_CONCURRENT_PER_HOST)
+    return _host_semaphores[host]
+
+# Upstream calls currently in flight, keyed by URL and params
+_inflight_requests: Dict[str, asyncio.Task] = {}
+
+# Retry backoff: exponential by default, capped so a user request isn't held for long
+MAX_RETRY_WAIT = 10
+MAX_RETRY_DELAY = 20
+_exponential_wait = wait_exponential(multiplier=1, max=MAX_RETRY_WAIT)
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """Retry on rate limiting (429) and server errors (5xx)"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return False
+
+def wait_for_retry(retry_state: RetryCallState) -> float:
+    """Wait as long as a 429's Retry-After asks (up to the cap), else back off exponentially"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_WAIT)
+    return _exponential_wait(retry_state)
+
 class WikimediaClient:
-    def __init__(self):
-        self.session = httpx.AsyncClient(timeout=30.0)
+    @property
+    def session(self) -> httpx.AsyncClient:
+        return get_http_client()
+    
+    async def fetch_json(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET a Wikimedia API URL, sharing one upstream call between identical concurrent requests"""
+        key = f"{url}?{sorted(params.items())}"
+        task = _inflight_requests.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_json(url, params))
+            _inflight_requests[key] = task
+            task.add_done_callback(lambda _: _inflight_requests.pop(key, None))
+        
+        # Shield so one cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
+    
+    @retry(
+        retry=retry_if_exception(is_retryable_error),
+        stop=stop_after_attempt(4) | stop_after_delay(MAX_RETRY_DELAY),
+        wait=wait_for_retry,
+        reraise=True
+    )
+    async def _fetch_json(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET a Wikimedia API URL under the rate limits and parse the JSON body"""
+        async with get_host_semaphore(url), WIKI_LIMITER:
+            response = await self.session.get(url, params=params)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        # Parse straight from the raw bytes, skipping a decoded text copy
+        return orjson.loads(response.content)
     
     async def search_wikipedia(self, query: str, lang: str = "en", limit: int = 10) -> List[Dict]:
         """Search Wikipedia articles for a location"""
         try:
-            wiki_lang = LANGUAGE_CODES.get(lang, "en")
-            api_url = f"https://{wiki_lang}.wikipedia.org/w/api.php"
+            api_url = WIKIPEDIA_API_URLS.get(lang, WIKIPEDIA_API)
             
             params = {
                 "action": "query",
@@ -62,8 +183,7 @@ class WikimediaClient:
                 "srprop": "snippet|titlesnippet|size"
             }
             
-            response = await self.session.get(api_url, params=params)
-            data = response.json()
+            data = await self.fetch_json(api_url, params)
             
             if "query" in data and "search" in data["query"]:
                 return data["query"]["search"]
@@ -71,96 +191,123 @@ class WikimediaClient:
             
         except Exception as e:
             logger.error(f"Wikipedia search error: {e}")
-            return []
+            raise
     
-    async def get_article_content(self, title: str, lang: str = "en") -> Dict[str, Any]:
-        """Get full article content and extract"""
+    async def get_article_content(
+        self,
+        title: str,
+        lang: str = "en",
+        want_categories: bool = True,
+        extract_chars: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get article content and extract, optionally without categories or with a shortened extract"""
+        articles = await self.get_article_contents([title], lang, want_categories, extract_chars)
+        return articles.get(title, {})
+    
+    async def get_article_contents(
+        self,
+        titles: List[str],
+        lang: str = "en",
+        want_categories: bool = True,
+        extract_chars: Optional[int] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Get content for up to 20 articles in one call, keyed by requested title"""
         try:
-            wiki_lang = LANGUAGE_CODES.get(lang, "en")
-            api_url = f"https://{wiki_lang}.wikipedia.org/w/api.php"
+            api_url = WIKIPEDIA_API_URLS.get(lang, WIKIPEDIA_API)
+            
+            # TextExtracts returns at most 20 intro extracts per query (exlimit=max)
+            batch = [title.replace("|", "") for title in titles[:MAX_ARTICLE_BATCH]]
+            if not batch:
+                return {}
+            
+            props = ["extracts", "pageimages", "coordinates"]
+            if want_categories:
+                props.append("categories")
             
             params = {
                 "action": "query",
                 "format": "json",
-                "titles": title,
-                "prop": "extracts|pageimages|coordinates|categories",
+                "titles": "|".join(batch),
+                "prop": "|".join(props),
                 "exintro": True,
                 "explaintext": True,
                 "exsectionformat": "plain",
+                "exlimit": "max",
                 "piprop": "original",
                 "coprop": "lat|lon",
-                "cllimit": 10
+                "colimit": "max"
             }
+            if want_categories:
+                # Category limit is shared across all pages in the query
+                params["cllimit"] = 10 * len(batch)
+            if extract_chars:
+                params["exchars"] = extract_chars
             
-            response = await self.session.get(api_url, params=params)
-            data = response.json()
+            data = await self.fetch_json(api_url, params)
             
             if "query" in data and "pages" in data["query"]:
-                page_data = list(data["query"]["pages"].values())[0]
-                return page_data
+                pages = {page.get("title"): page for page in data["query"]["pages"].values()}
+                
+                # Map titles the API normalized (e.g. case, underscores) back to what was asked for
+                normalized = {n["from"]: n["to"] for n in data["query"].get("normalized", [])}
+                
+                articles = {}
+                for title, requested in zip(titles, batch):
+                    page = pages.get(normalized.get(requested, requested))
+                    if page is not None:
+                        articles[title] = page
+                return articles
             return {}
             
         except Exception as e:
             logger.error(f"Article content error: {e}")
-            return {}
+            raise
     
     async def get_commons_images(self, search_term: str, limit: int = 10) -> List[Dict]:
         """Get images from Wikimedia Commons"""
         try:
+            # Search the File namespace and fetch image info in a single call
             params = {
                 "action": "query",
                 "format": "json",
-                "list": "search",
-                "srnamespace": 6,  # File namespace
-                "srsearch": f"{search_term} India",
-                "srlimit": limit,
-                "srprop": "snippet|titlesnippet"
+                "generator": "search",
+                "gsrnamespace": 6,  # File namespace
+                "gsrsearch": f"{search_term} India",
+                "gsrlimit": limit,
+                "prop": "imageinfo",
+                "iiprop": "url|size|mime|extmetadata",
+                "iiurlwidth": 400
             }
             
-            response = await self.session.get(COMMONS_API, params=params)
-            data = response.json()
+            data = await self.fetch_json(COMMONS_API, params)
             
-            if "query" in data and "search" in data["query"]:
+            if "query" in data and "pages" in data["query"]:
+                # Generator results are keyed by page id; "index" keeps search rank
+                pages = sorted(data["query"]["pages"].values(), key=lambda p: p.get("index", 0))
                 images = []
-                for item in data["query"]["search"]:
-                    # Get image info
-                    img_params = {
-                        "action": "query",
-                        "format": "json",
-                        "titles": item["title"],
-                        "prop": "imageinfo",
-                        "iiprop": "url|size|mime|extmetadata",
-                        "iiurlwidth": 400
-                    }
-                    
-                    img_response = await self.session.get(COMMONS_API, params=img_params)
-                    img_data = img_response.json()
-                    
-                    if "query" in img_data and "pages" in img_data["query"]:
-                        page = list(img_data["query"]["pages"].values())[0]
-                        if "imageinfo" in page:
-                            img_info = page["imageinfo"][0]
-                            images.append({
-                                "title": item["title"].replace("File:", ""),
-                                "url": img_info.get("thumburl", img_info.get("url")),
-                                "full_url": img_info.get("url"),
-                                "width": img_info.get("thumbwidth", img_info.get("width")),
-                                "height": img_info.get("thumbheight", img_info.get("height")),
-                                "description": img_info.get("extmetadata", {}).get("ImageDescription", {}).get("value", "")
-                            })
-                
+                for page in pages:
+                    if "imageinfo" in page:
+                        img_info = page["imageinfo"][0]
+                        images.append({
+                            "title": page["title"].replace("File:", ""),
+                            "url": img_info.get("thumburl", img_info.get("url")),
+                            "full_url": img_info.get("url"),
+                            "width": img_info.get("thumbwidth", img_info.get("width")),
+                            "height": img_info.get("thumbheight", img_info.get("height")),
+                            "description": img_info.get("extmetadata", {}).get("ImageDescription", {}).get("value", "")
+                        })
+            
                 return images[:limit]
             return []
             
         except Exception as e:
             logger.error(f"Commons images error: {e}")
-            return []
+            raise
     
     async def get_wikivoyage_content(self, location: str, lang: str = "en") -> Dict[str, Any]:
         """Get travel and cultural information from Wikivoyage"""
         try:
-            wiki_lang = LANGUAGE_CODES.get(lang, "en")
-            api_url = f"https://{wiki_lang}.wikivoyage.org/w/api.php"
+            api_url = WIKIVOYAGE_API_URLS.get(lang, WIKIVOYAGE_API)
             
             params = {
                 "action": "query",
@@ -173,25 +320,129 @@ class WikimediaClient:
                 "piprop": "original"
             }
             
-            response = await self.session.get(api_url, params=params)
-            data = response.json()
+            data = await self.fetch_json(api_url, params)
             
             if "query" in data and "pages" in data["query"]:
-                page_data = list(data["query"]["pages"].values())[0]
+                page_data = next(iter(data["query"]["pages"].values()), {})
                 return page_data
             return {}
             
         except Exception as e:
             logger.error(f"Wikivoyage content error: {e}")
-            return {}
+            raise
 
 # Initialize Wikimedia client
 wikimedia = WikimediaClient()
 
+class CompressedORJSONCoder(Coder):
+    """Store cached responses as zlib-compressed orjson"""
+    
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        return zlib.compress(orjson.dumps(jsonable_encoder(value)), 1)
+    
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        return orjson.loads(zlib.decompress(value))
+
+class BoundedMemoryBackend(Backend):
+    """In-process cache backend with LRU eviction and per-entry expiry"""
+    
+    def __init__(self, maxsize: int = MEMORY_CACHE_MAXSIZE):
+        # Values are (data, expires_at); TLRUCache evicts expired entries before LRU ones
+        self._store = TLRUCache(maxsize=maxsize, ttu=lambda _key, value, _now: value[1], timer=time.monotonic)
+    
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        entry = self._store.get(key)
+        if entry is None:
+            return 0, None
+        return int(entry[1] - time.monotonic()), entry[0]
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._store.get(key)
+        return entry[0] if entry is not None else None
+    
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + expire if expire else float("inf")
+        self._store[key] = (value, expires_at)
+    
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if namespace:
+            keys = [k for k in self._store if k.startswith(namespace)]
+        else:
+            keys = [key] if key in self._store else []
+        for k in keys:
+            self._store.pop(k, None)
+        return len(keys)
+
+class PartialResultError(Exception):
+    """Raised from a cached function whose optional sources failed, so its result isn't cached"""
+    
+    def __init__(self, result: Any):
+        super().__init__("Partial result")
+        self.result = result
+
+def cache_key_builder(func, namespace: str = "", *, request=None, response=None, args=(), kwargs=None) -> str:
+    """Build locale-prefixed cache keys from the call's arguments"""
+    # Bind positional and keyword arguments alike (with defaults) to parameter names
+    bound = inspect.signature(func).bind_partial(*args, **(kwargs or {}))
+    bound.apply_defaults()
+    params = dict(bound.arguments)
+    lang = params.pop("lang", "en")
+    
+    # Stable digest (built-in hash() is salted per process)
+    digest = hashlib.md5(repr(sorted(params.items())).encode()).hexdigest()
+    return f"{FastAPICache.get_prefix()}:{namespace}:{lang}:{digest}"
+
+@app.on_event("startup")
+async def init_cache():
+    """Set up the response cache, shared via Redis when REDIS_URL is set"""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        backend = RedisBackend(redis.from_url(redis_url))
+    else:
+        logger.warning("REDIS_URL not set, using in-process response cache")
+        backend = BoundedMemoryBackend()
+    
+    FastAPICache.init(backend, prefix="ll", coder=CompressedORJSONCoder, key_builder=cache_key_builder)
+
+@app.on_event("startup")
+async def warm_http_connections():
+    """Open pooled connections to the Wikimedia hosts before the first request"""
+    # Short timeout so a slow host can't hold up startup; this is only a warm-up
+    await asyncio.gather(
+        *(wikimedia.session.head(url, timeout=2.0) for url in (WIKIPEDIA_API, COMMONS_API, WIKIVOYAGE_API)),
+        return_exceptions=True
+    )
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close pooled connections when the server stops"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 @app.get("/")
 async def root():
     return {"message": "Local Lore API - Discover India's Hidden Heritage"}
 
+@cache(expire=SEARCH_CACHE_TTL, namespace="search")
+async def find_locations(query: str, lang: str, limit: int) -> List[Dict[str, Any]]:
+    """Search Wikipedia and format the matching locations"""
+    wiki_results = await wikimedia.search_wikipedia(query, lang, limit)
+    
+    locations = []
+    for result in wiki_results:
+        locations.append({
+            "id": result["title"].replace(" ", "_"),
+            "title": result["title"],
+            "snippet": result.get("snippet", ""),
+            "source": "wikipedia"
+        })
+    
+    return locations
+
 @app.get("/api/search")
 async def search_locations(
     query: str = Query(..., description="Location to search for"),
@@ -199,19 +450,13 @@ async def search_locations(
     limit: int = Query(10, ge=1, le=20, description="Number of results")
 ):
     """Search for locations across Wikipedia and Wikivoyage"""
+    # Skip the upstream call for empty or single-character queries
+    if len(query.strip()) < 2:
+        return {"query": query, "language": lang, "total": 0, "locations": []}
+    
     try:
-        # Search Wikipedia
-        wiki_results = await wikimedia.search_wikipedia(query, lang, limit)
-        
-        # Format results
-        locations = []
-        for result in wiki_results:
-            locations.append({
-                "id": result["title"].replace(" ", "_"),
-                "title": result["title"],
-                "snippet": result.get("snippet", ""),
-                "source": "wikipedia"
-            })
+        # Case-insensitive queries share one cache entry; the response echoes the original
+        locations = await find_locations(query=query.strip().lower(), lang=lang, limit=limit)
         
         return {
             "query": query,
@@ -220,10 +465,61 @@ async def search_locations(
             "locations": locations
         }
         
+    except httpx.HTTPError as e:
+        logger.error(f"Search upstream error: {e}")
+        raise HTTPException(status_code=502, detail="Wikimedia service unavailable")
     except Exception as e:
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail="Search service unavailable")
 
+@cache(expire=ARTICLE_CACHE_TTL, namespace="heritage")
+async def build_heritage_content(location_id: str, lang: str) -> Dict[str, Any]:
+    """Assemble heritage content; only complete results are returned (and cached)"""
+    # Convert location_id back to title
+    location_title = location_id.replace("_", " ")
+    
+    # Fetch data from multiple sources concurrently
+    wiki_content, images, wikivoyage_content = await asyncio.gather(
+        wikimedia.get_article_content(location_title, lang),
+        wikimedia.get_commons_images(location_title),
+        wikimedia.get_wikivoyage_content(location_title, lang),
+        return_exceptions=True
+    )
+    
+    # The Wikipedia article is required; images and travel info are optional
+    if isinstance(wiki_content, Exception):
+        raise wiki_content
+    degraded = False
+    if isinstance(images, Exception):
+        images = []
+        degraded = True
+    if isinstance(wikivoyage_content, Exception):
+        wikivoyage_content = {}
+        degraded = True
+    
+    # Extract key information
+    heritage_data = {
+        "location_id": location_id,
+        "title": location_title,
+        "language": lang,
+        "wikipedia": {
+            "extract": wiki_content.get("extract", ""),
+            "coordinates": wiki_content.get("coordinates", []),
+            "categories": [cat.get("title", "") for cat in wiki_content.get("categories", [])],
+            "page_image": wiki_content.get("pageimage", "")
+        },
+        "travel_info": {
+            "extract": wikivoyage_content.get("extract", ""),
+            "page_image": wikivoyage_content.get("pageimage", "")
+        },
+        "images": images,
+        "summary": analyze_extract(wiki_content.get("extract", ""))
+    }
+    
+    if degraded:
+        raise PartialResultError(heritage_data)
+    return heritage_data
+
 @app.get("/api/heritage/{location_id}")
 async def get_heritage_content(
     location_id: str,
@@ -231,54 +527,66 @@ async def get_heritage_content(
 ):
     """Get comprehensive heritage content for a location"""
     try:
-        # Convert location_id back to title
-        location_title = location_id.replace("_", " ")
-        
-        # Fetch data from multiple sources concurrently
-        wiki_content, images, wikivoyage_content = await asyncio.gather(
-            wikimedia.get_article_content(location_title, lang),
-            wikimedia.get_commons_images(location_title),
-            wikimedia.get_wikivoyage_content(location_title, lang),
-            return_exceptions=True
-        )
-        
-        # Handle exceptions
-        if isinstance(wiki_content, Exception):
-            wiki_content = {}
-        if isinstance(images, Exception):
-            images = []
-        if isinstance(wikivoyage_content, Exception):
-            wikivoyage_content = {}
-        
-        # Extract key information
-        heritage_data = {
-            "location_id": location_id,
-            "title": location_title,
-            "language": lang,
-            "wikipedia": {
-                "extract": wiki_content.get("extract", ""),
-                "coordinates": wiki_content.get("coordinates", []),
-                "categories": [cat.get("title", "") for cat in wiki_content.get("categories", [])],
-                "page_image": wiki_content.get("pageimage", "")
-            },
-            "travel_info": {
-                "extract": wikivoyage_content.get("extract", ""),
-                "page_image": wikivoyage_content.get("pageimage", "")
-            },
-            "images": images,
-            "summary": {
-                "heritage_facts": extract_heritage_facts(wiki_content.get("extract", "")),
-                "cultural_significance": extract_cultural_info(wiki_content.get("extract", "")),
-                "historical_timeline": extract_historical_dates(wiki_content.get("extract", ""))
-            }
-        }
-        
-        return heritage_data
+        return await build_heritage_content(location_id=location_id, lang=lang)
         
+    except PartialResultError as e:
+        # Serve what loaded, but keep it out of the cache
+        return e.result
+    except httpx.HTTPError as e:
+        logger.error(f"Heritage content upstream error: {e}")
+        raise HTTPException(status_code=502, detail="Wikimedia service unavailable")
     except Exception as e:
         logger.error(f"Heritage content error: {e}")
         raise HTTPException(status_code=500, detail="Heritage content service unavailable")
 
+@cache(expire=SEARCH_CACHE_TTL, namespace="nearby")
+async def find_nearby_places(lat: float, lon: float, radius: int, lang: str) -> List[Dict[str, Any]]:
+    """Find Wikipedia articles near the given coordinates, with short extracts"""
+    # Use Wikipedia's geosearch API
+    params = {
+        "action": "query",
+        "format": "json",
+        "list": "geosearch",
+        "gscoord": f"{lat}|{lon}",
+        "gsradius": radius * 1000,  # Convert to meters
+        "gslimit": 20,
+        "gsnamespace": 0
+    }
+    
+    api_url = WIKIPEDIA_API_URLS.get(lang, WIKIPEDIA_API)
+    
+    data = await wikimedia.fetch_json(api_url, params)
+    
+    places = data.get("query", {}).get("geosearch", [])
+    
+    # Enrich all results with short extracts in a single batched call; these are optional
+    try:
+        articles = await wikimedia.get_article_contents(
+            [place["title"] for place in places], lang,
+            want_categories=False, extract_chars=300
+        )
+        degraded = False
+    except httpx.HTTPError:
+        articles = {}
+        degraded = True
+    
+    nearby_places = []
+    for place in places:
+        nearby_places.append({
+            "id": place["title"].replace(" ", "_"),
+            "title": place["title"],
+            "extract": articles.get(place["title"], {}).get("extract", ""),
+            "distance": place.get("dist", 0),
+            "coordinates": {
+                "lat": place.get("lat", 0),
+                "lon": place.get("lon", 0)
+            }
+        })
+    
+    if degraded:
+        raise PartialResultError(nearby_places)
+    return nearby_places
+
 @app.get("/api/nearby")
 async def get_nearby_heritage(
     lat: float = Query(..., description="Latitude"),
@@ -288,36 +596,14 @@ async def get_nearby_heritage(
 ):
     """Find heritage sites near given coordinates"""
     try:
-        # Use Wikipedia's geosearch API
-        params = {
-            "action": "query",
-            "format": "json",
-            "list": "geosearch",
-            "gscoord": f"{lat}|{lon}",
-            "gsradius": radius * 1000,  # Convert to meters
-            "gslimit": 20,
-            "gsnamespace": 0
-        }
-        
-        wiki_lang = LANGUAGE_CODES.get(lang, "en")
-        api_url = f"https://{wiki_lang}.wikipedia.org/w/api.php"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(api_url, params=params)
-            data = response.json()
-        
-        nearby_places = []
-        if "query" in data and "geosearch" in data["query"]:
-            for place in data["query"]["geosearch"]:
-                nearby_places.append({
-                    "id": place["title"].replace(" ", "_"),
-                    "title": place["title"],
-                    "distance": place.get("dist", 0),
-                    "coordinates": {
-                        "lat": place.get("lat", 0),
-                        "lon": place.get("lon", 0)
-                    }
-                })
+        # Search from ~100m coordinate buckets so nearby requests share one cache entry
+        try:
+            nearby_places = await find_nearby_places(
+                lat=round(lat, 3), lon=round(lon, 3), radius=radius, lang=lang
+            )
+        except PartialResultError as e:
+            # Places without extracts are still useful, but keep them out of the cache
+            nearby_places = e.result
         
         return {
             "center": {"lat": lat, "lon": lon},
@@ -326,86 +612,80 @@ async def get_nearby_heritage(
             "places": nearby_places
         }
         
+    except httpx.HTTPError as e:
+        logger.error(f"Nearby search upstream error: {e}")
+        raise HTTPException(status_code=502, detail="Wikimedia service unavailable")
     except Exception as e:
         logger.error(f"Nearby search error: {e}")
         raise HTTPException(status_code=500, detail="Nearby search service unavailable")
 
-def extract_heritage_facts(text: str) -> List[str]:
-    """Extract interesting heritage facts from text using simple NLP"""
-    if not text:
-        return []
-    
-    facts = []
-    sentences = text.split('. ')
-    
-    # Look for sentences with heritage-related keywords
-    heritage_keywords = [
-        'built', 'constructed', 'established', 'founded', 'century', 
-        'ancient', 'historical', 'heritage', 'monument', 'temple',
-        'fort', 'palace', 'architecture', 'dynasty', 'empire'
-    ]
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if len(sentence) > 20 and any(keyword in sentence.lower() for keyword in heritage_keywords):
-            facts.append(sentence + '.')
-    
-    return facts[:5]  # Return top 5 facts
+# Keyword sets for sentence classification
+HERITAGE_KEYWORDS = frozenset({
+    'built', 'constructed', 'established', 'founded', 'century', 
+    'ancient', 'historical', 'heritage', 'monument', 'temple',
+    'fort', 'palace', 'architecture', 'dynasty', 'empire'
+})
 
-def extract_cultural_info(text: str) -> List[str]:
-    """Extract cultural significance information"""
-    if not text:
-        return []
-    
+CULTURAL_KEYWORDS = frozenset({
+    'culture', 'tradition', 'festival', 'ritual', 'worship',
+    'pilgrimage', 'sacred', 'religious', 'spiritual', 'art',
+    'craft', 'music', 'dance', 'cuisine', 'custom'
+})
+
+# Match keywords at the start of a word so plurals ("temples") still count
+HERITAGE_RE = re.compile(r'\b(?:' + '|'.join(sorted(HERITAGE_KEYWORDS)) + ')', re.IGNORECASE)
+CULTURAL_RE = re.compile(r'\b(?:' + '|'.join(sorted(CULTURAL_KEYWORDS)) + ')', re.IGNORECASE)
+
+# 4-digit years and century mentions
+YEAR_RE = re.compile(r'\b(1[0-9]{3}|20[0-2][0-9])\b')
+CENTURY_RE = re.compile(r'\b(\d{1,2})(st|nd|rd|th)\s+century\b', re.IGNORECASE)
+
+def analyze_extract(text: str) -> Dict[str, Any]:
+    """Extract heritage facts, cultural info and dates in a single pass over the text"""
+    facts = []
     cultural_info = []
-    sentences = text.split('. ')
-    
-    cultural_keywords = [
-        'culture', 'tradition', 'festival', 'ritual', 'worship',
-        'pilgrimage', 'sacred', 'religious', 'spiritual', 'art',
-        'craft', 'music', 'dance', 'cuisine', 'custom'
-    ]
     
-    for sentence in sentences:
+    for sentence in text.split('. '):
         sentence = sentence.strip()
-        if len(sentence) > 20 and any(keyword in sentence.lower() for keyword in cultural_keywords):
+        if len(sentence) <= 20:
+            continue
+        if len(facts) < 5 and HERITAGE_RE.search(sentence):
+            facts.append(sentence + '.')
+        if len(cultural_info) < 3 and CULTURAL_RE.search(sentence):
             cultural_info.append(sentence + '.')
+        if len(facts) == 5 and len(cultural_info) == 3:
+            break
     
-    return cultural_info[:3]
+    return {
+        "heritage_facts": facts,
+        "cultural_significance": cultural_info,
+        "historical_timeline": extract_historical_dates(text)
+    }
 
 def extract_historical_dates(text: str) -> List[Dict[str, str]]:
-    """Extract historical dates and events"""
+    """Extract historical dates and events, earliest first"""
     if not text:
         return []
     
-    # Simple regex to find years and centuries
-    import re
+    # Deduplicated entries keyed by (approximate start year, type) for a chronological sort
+    entries = {}
     
-    timeline = []
-    
-    # Find 4-digit years
-    year_pattern = r'\b(1[0-9]{3}|20[0-2][0-9])\b'
-    years = re.findall(year_pattern, text)
-    
-    # Find century mentions
-    century_pattern = r'\b(\d{1,2})(st|nd|rd|th)\s+century\b'
-    centuries = re.findall(century_pattern, text, re.IGNORECASE)
-    
-    for year in set(years):
-        timeline.append({
+    for year in YEAR_RE.findall(text):
+        entries[(int(year), "year")] = {
             "period": year,
             "type": "year"
-        })
+        }
     
-    for century, suffix in centuries:
-        timeline.append({
-            "period": f"{century}{suffix} century",
+    for century, suffix in CENTURY_RE.findall(text):
+        entries[((int(century) - 1) * 100 + 1, "century")] = {
+            "period": f"{century}{suffix.lower()} century",
             "type": "century"
-        })
+        }
     
-    return sorted(timeline, key=lambda x: x["period"])[:5]
+    return [entries[key] for key in sorted(entries)[:5]]
 
 @app.get("/api/languages")
+@cache(expire=LANGUAGES_CACHE_TTL, namespace="languages")
 async def get_supported_languages():
     """Get list of supported languages"""
     return {
@@ -421,4 +701,6 @@ async def get_supported_languages():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))  # Use Render's PORT env var or default to 8000
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", 4))
+    # Import string so each worker process builds its own app and HTTP pool after fork
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)